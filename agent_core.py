@@ -0,0 +1,433 @@
+"""
+Núcleo compartilhado do StylistAgent
+Cliente do projeto, preparo de imagens, tool calls e execução de runs usados
+pelo chat no terminal (agent_chat.py) e pela interface Gradio
+"""
+
+import os
+import re
+import time
+import json
+import io
+import binascii
+from concurrent.futures import ThreadPoolExecutor
+from functools import cache, lru_cache
+from itertools import chain
+from dotenv import load_dotenv
+
+# Dependências pesadas (Azure SDK, Pillow e OpenCV/NumPy via colorimetria)
+# são importadas dentro das funções que as usam, para que o banner e as saídas
+# de erro não esperem por elas
+
+# Carregar variáveis de ambiente
+load_dotenv()
+
+# orjson (opcional) serializa as saídas das tools bem mais rápido que json
+try:
+    import orjson
+
+    def json_dumps(obj) -> str:
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY).decode("utf-8")
+
+    json_loads = orjson.loads
+except ImportError:
+    json_dumps = json.dumps
+    json_loads = json.loads
+
+# Tamanho de leitura para codificar imagens (múltiplo de 3, sem padding
+# base64 no meio do stream)
+ENCODE_CHUNK_SIZE = 48 * 1024
+
+# Maior lado das imagens enviadas ao modelo; modelos de visão já reduzem
+# internamente para algo próximo disso
+MODEL_IMAGE_MAX_SIDE = 1024
+
+# Formatos (do Pillow) que o modelo aceita; os demais são recodificados
+MODEL_IMAGE_FORMATS = ("JPEG", "MPO", "PNG", "WEBP", "GIF")
+
+# Envia imagens como arquivos do agente em vez de data URLs base64
+UPLOAD_IMAGES = os.environ.get("UPLOAD_IMAGES", "false").lower() == "true"
+
+# Consome os runs como stream de eventos; use USE_STREAMING=false em
+# implantações sem suporte a streaming para voltar ao polling
+USE_STREAMING = os.environ.get("USE_STREAMING", "true").lower() == "true"
+
+# Backoff do polling: começa rápido, cresce 1.5x a cada consulta sem mudança
+# até o teto de cada status, e recomeça sempre que o status do run muda
+POLL_INITIAL_DELAY = 0.05
+POLL_MAX_DELAY = {
+    "queued": 0.25,
+    "in_progress": 0.5,
+    "requires_action": 0.1,
+    "cancelling": 0.25,
+}
+
+# Status finais de um run que não produziu resposta
+RUN_FAILED_STATUSES = ("failed", "cancelled", "expired", "incomplete")
+
+# Quem analisa a foto enviada: a tool local de colorimetria ("tool"), a
+# entrada de visão do modelo ("vision") ou ambas ("both")
+ANALYSIS_MODES = ("tool", "vision", "both")
+ANALYSIS_MODE = os.environ.get("ANALYSIS_MODE", "both").lower()
+if ANALYSIS_MODE not in ANALYSIS_MODES:
+    raise ValueError(f"ANALYSIS_MODE inválido: {ANALYSIS_MODE}. Use um de {ANALYSIS_MODES}")
+
+# Nível de detalhe da visão: "low" basta para cores (tons de pele, cabelo e
+# roupas sobrevivem a 512x512) e custa bem menos tokens; "high" só quando o
+# usuário pede detalhes espaciais
+IMAGE_DETAIL_HIGH_PATTERN = re.compile(r"padronagem|estampa|textura|detalhe", re.IGNORECASE)
+
+# Texto enviado junto com uma foto quando o usuário não escreve nada
+IMAGE_PROMPT = "Enviei uma foto. Por favor, analise minha coloração pessoal."
+
+
+@cache
+def get_project_client():
+    """Cria o cliente do projeto no primeiro uso; as chamadas seguintes reutilizam o mesmo"""
+    import requests
+    from requests.adapters import HTTPAdapter
+    from azure.core.pipeline.transport import RequestsTransport
+    from azure.ai.projects import AIProjectClient
+    from azure.identity import (
+        AzureCliCredential,
+        ChainedTokenCredential,
+        EnvironmentCredential,
+        ManagedIdentityCredential,
+    )
+
+    # Sessão HTTP compartilhada: mantém o pool de conexões (e as sessões TLS)
+    # entre todas as chamadas do SDK
+    http_session = requests.Session()
+    http_session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+
+    # Cadeia de credenciais explícita: service principal via variáveis de
+    # ambiente, depois `az login`, depois managed identity. Evita as sondagens que
+    # o DefaultAzureCredential faz em fontes que esta aplicação nunca usa.
+    credential = ChainedTokenCredential(
+        EnvironmentCredential(),
+        AzureCliCredential(),
+        ManagedIdentityCredential(),
+    )
+    return AIProjectClient(
+        endpoint=os.environ["PROJECT_ENDPOINT"],
+        credential=credential,
+        transport=RequestsTransport(session=http_session, session_owner=False),
+    )
+
+
+def detect_image_mime(header: bytes):
+    """Identifica o formato da imagem pelos primeiros bytes (None se não for aceito pelo modelo)"""
+    if header.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return "image/webp"
+    if header[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    if header.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    return None
+
+
+def prepare_image_for_model(path: str):
+    """
+    Reduz imagens maiores que MODEL_IMAGE_MAX_SIDE e recodifica formatos que o
+    modelo não aceita (BMP, TIFF...) antes do envio.
+    Retorna (bytes, mime) da imagem recodificada, ou None se o arquivo pode
+    ser enviado como está.
+    """
+    from PIL import Image, ImageOps, UnidentifiedImageError
+
+    try:
+        with Image.open(path) as im:
+            if max(im.size) <= MODEL_IMAGE_MAX_SIDE and im.format in MODEL_IMAGE_FORMATS:
+                return None
+            im = ImageOps.exif_transpose(im)
+            im.thumbnail((MODEL_IMAGE_MAX_SIDE, MODEL_IMAGE_MAX_SIDE), Image.Resampling.LANCZOS)
+            buffer = io.BytesIO()
+            # Mantém PNG apenas quando há transparência a preservar
+            if im.mode in ("RGBA", "LA") or "transparency" in im.info:
+                im.save(buffer, format="PNG", optimize=True)
+                return buffer.getvalue(), "image/png"
+            im.convert("RGB").save(buffer, format="JPEG", quality=85, optimize=True)
+            return buffer.getvalue(), "image/jpeg"
+    except UnidentifiedImageError:
+        # Formato que o Pillow não lê: segue o arquivo original, se o modelo aceitar
+        return None
+
+
+def encode_data_url(chunks, size: int, mime: str) -> str:
+    """Codifica os blocos de bytes em uma data URL base64 num buffer pré-alocado"""
+    prefix = f"data:{mime};base64,".encode("ascii")
+    # Buffer de saída: prefixo + 4 * ceil(size / 3)
+    buffer = bytearray(len(prefix) + (size + 2) // 3 * 4)
+    buffer[:len(prefix)] = prefix
+    pos = len(prefix)
+    for chunk in chunks:
+        encoded = binascii.b2a_base64(chunk, newline=False)
+        buffer[pos:pos + len(encoded)] = encoded
+        pos += len(encoded)
+    del buffer[pos:]
+    return buffer.decode("ascii")
+
+
+def image_file_to_data_url(path: str) -> str:
+    """Codifica um arquivo de imagem em data URL base64, reduzindo-o se necessário"""
+    # Reaproveita a data URL quando a mesma imagem é enviada de novo; mtime e
+    # tamanho na chave fazem um arquivo alterado ser codificado outra vez
+    st = os.stat(path)
+    return _encode_cached(path, st.st_mtime_ns, st.st_size)
+
+
+@lru_cache(maxsize=4)
+def _encode_cached(path: str, mtime_ns: int, size: int) -> str:
+    prepared = prepare_image_for_model(path)
+    if prepared is not None:
+        image_bytes, mime = prepared
+        return encode_data_url([image_bytes], len(image_bytes), mime)
+
+    # Já é pequena: codifica o arquivo em blocos. O size da chave só dimensiona
+    # o buffer; encode_data_url tolera um arquivo alterado desde o stat
+    with open(path, "rb") as f:
+        first = f.read(ENCODE_CHUNK_SIZE)
+        chunks = chain([first], iter(lambda: f.read(ENCODE_CHUNK_SIZE), b""))
+        mime = detect_image_mime(first)
+        if mime is None:
+            raise ValueError("Formato de imagem não suportado")
+        return encode_data_url(chunks, size, mime)
+
+
+def upload_image_file(path: str) -> str:
+    """Envia a imagem (reduzida se necessário) como arquivo do agente e retorna o file_id"""
+    # Mesma chave do cache de data URLs: reenviar a mesma foto não sobe outro arquivo
+    st = os.stat(path)
+    return _upload_cached(path, st.st_mtime_ns, st.st_size)
+
+
+# file_ids enviados nesta sessão, apagados por delete_uploaded_files
+_uploaded_file_ids = set()
+
+
+@lru_cache(maxsize=4)
+def _upload_cached(path: str, mtime_ns: int, size: int) -> str:
+    from azure.ai.agents.models import FilePurpose
+
+    files = get_project_client().agents.files
+    prepared = prepare_image_for_model(path)
+    if prepared is not None:
+        image_bytes, mime = prepared
+        extension = ".png" if mime == "image/png" else ".jpg"
+        filename = os.path.splitext(os.path.basename(path))[0] + extension
+        uploaded = files.upload_and_poll(
+            file=io.BytesIO(image_bytes),
+            filename=filename,
+            purpose=FilePurpose.AGENTS,
+        )
+    else:
+        uploaded = files.upload_and_poll(file_path=path, purpose=FilePurpose.AGENTS)
+    _uploaded_file_ids.add(uploaded.id)
+    return uploaded.id
+
+
+def delete_uploaded_files():
+    """
+    Apaga os arquivos de imagem enviados ao agente. As mensagens da thread
+    continuam referenciando os arquivos, então só deve ser chamada quando a
+    conversa termina.
+    """
+    _upload_cached.cache_clear()
+    while _uploaded_file_ids:
+        file_id = _uploaded_file_ids.pop()
+        try:
+            get_project_client().agents.files.delete(file_id)
+        except Exception as e:
+            print(f"Erro ao apagar arquivo {file_id}: {e}")
+
+
+def build_image_blocks(image_path: str, detail: str = "low"):
+    """
+    Monta os blocos de conteúdo de uma imagem de acordo com ANALYSIS_MODE,
+    com o nível de detalhe `detail` ("low" ou "high") para o modelo.
+    Retorna (blocos, image_data), onde image_data é o que a tool
+    analisar_imagem recebe (bytes, caminho do arquivo ou data URL).
+    """
+    from azure.ai.agents.models import (
+        MessageImageFileParam,
+        MessageImageUrlParam,
+        MessageInputImageFileBlock,
+        MessageInputImageUrlBlock,
+    )
+
+    if ANALYSIS_MODE == "tool":
+        # Apenas a tool local analisa a foto: nada é enviado ao modelo
+        with open(image_path, "rb") as f:
+            return [], f.read()
+
+    if UPLOAD_IMAGES:
+        # Bytes brutos na rede: sem a expansão de 4/3 do base64
+        file_param = MessageImageFileParam(file_id=upload_image_file(image_path), detail=detail)
+        return [MessageInputImageFileBlock(image_file=file_param)], image_path
+
+    img_data_url = image_file_to_data_url(image_path)
+    url_param = MessageImageUrlParam(url=img_data_url, detail=detail)
+    return [MessageInputImageUrlBlock(image_url=url_param)], img_data_url
+
+
+def build_message_content(user_text: str, image_path: str = None):
+    """
+    Monta o conteúdo da mensagem do usuário. Sem image_path, o comando
+    `imagem:<caminho>` no texto também anexa uma imagem, enviada em alta
+    resolução apenas se o texto pedir detalhes (padronagem, textura...).
+    Retorna (blocos, image_data); erros ao carregar a imagem são propagados.
+    """
+    from azure.ai.agents.models import MessageInputTextBlock
+
+    if image_path is None and user_text.lower().startswith("imagem:"):
+        image_path = user_text[7:].strip()
+        user_text = ""
+
+    if image_path is None:
+        return [MessageInputTextBlock(text=user_text)], None
+
+    detail = "high" if IMAGE_DETAIL_HIGH_PATTERN.search(user_text) else "low"
+    image_blocks, image_data = build_image_blocks(image_path, detail)
+    if ANALYSIS_MODE == "tool" and user_text:
+        # O modelo não vê a foto: o texto fixo sinaliza que ela foi enviada
+        # mesmo quando o usuário escreve uma legenda
+        user_text = f"{IMAGE_PROMPT}\n{user_text}"
+    return [MessageInputTextBlock(text=user_text or IMAGE_PROMPT), *image_blocks], image_data
+
+
+def process_tool_call(tool_call, image_data=None):
+    """Executa uma tool call e retorna a saída serializada"""
+    from colorimetria import analisar_imagem
+    from biotipo import classificar_biotipo
+
+    tool_name = tool_call.function.name
+
+    print(f"\n[Tool Call] {tool_name}")
+
+    if tool_name == "analisar_imagem":
+        try:
+            output = analisar_imagem(image_data)
+            return json_dumps(output)
+        except Exception as e:
+            return json_dumps({"erro": str(e)})
+
+    elif tool_name == "classificar_biotipo":
+        try:
+            args = json_loads(tool_call.function.arguments)
+            output = classificar_biotipo(
+                args.get("ombro"),
+                args.get("cintura"),
+                args.get("quadril"),
+            )
+            return json_dumps(output)
+        except Exception as e:
+            return json_dumps({"erro": str(e)})
+
+    else:
+        return json_dumps({"erro": f"Ferramenta desconhecida: {tool_name}"})
+
+
+def process_tool_calls(tool_calls, image_data=None):
+    """Executa as tool calls de uma etapa em paralelo, mantendo a ordem original"""
+    if not tool_calls:
+        return []
+    with ThreadPoolExecutor(max_workers=len(tool_calls)) as executor:
+        outputs = executor.map(lambda tc: process_tool_call(tc, image_data), tool_calls)
+        return [
+            {"tool_call_id": tool_call.id, "output": output}
+            for tool_call, output in zip(tool_calls, outputs)
+        ]
+
+
+def poll_run(thread_id: str, agent_id: str, image_data=None):
+    """Cria o run e consulta até terminar, tratando tool calls (sem streaming)"""
+    from azure.ai.agents.models import SubmitToolOutputsAction
+
+    project_client = get_project_client()
+    run = project_client.agents.runs.create(thread_id=thread_id, agent_id=agent_id)
+    status = run.status
+    delay = POLL_INITIAL_DELAY
+
+    while run.status in POLL_MAX_DELAY:
+        if run.status == "requires_action" and isinstance(run.required_action, SubmitToolOutputsAction):
+            tool_calls = run.required_action.submit_tool_outputs.tool_calls
+            run = project_client.agents.runs.submit_tool_outputs(
+                thread_id=thread_id,
+                run_id=run.id,
+                tool_outputs=process_tool_calls(tool_calls, image_data),
+            )
+        else:
+            time.sleep(delay)
+            run = project_client.agents.runs.get(thread_id=thread_id, run_id=run.id)
+
+        if run.status != status:
+            status = run.status
+            delay = POLL_INITIAL_DELAY
+        elif status in POLL_MAX_DELAY:
+            delay = min(delay * 1.5, POLL_MAX_DELAY[status])
+
+    return run
+
+
+def execute_run(thread_id: str, agent_id: str, image_data=None):
+    """
+    Executa um run do agente na thread, tratando as tool calls, e gera o
+    texto da resposta: trechos à medida que chegam com USE_STREAMING, ou a
+    resposta inteira de uma vez no modo polling.
+    Lança RuntimeError se o run ou o stream falhar.
+    """
+    from azure.ai.agents.models import (
+        AgentStreamEvent,
+        MessageDeltaChunk,
+        MessageRole,
+        SubmitToolOutputsAction,
+        ThreadRun,
+    )
+
+    project_client = get_project_client()
+
+    if not USE_STREAMING:
+        run = poll_run(thread_id, agent_id, image_data)
+        # Qualquer final que não seja "completed" (failed, cancelled, expired,
+        # incomplete) não gerou resposta nova: a última mensagem do agente
+        # seria a do turno anterior
+        if run.status != "completed":
+            raise RuntimeError(f"Erro no run (status {run.status}): {run.last_error}")
+        reply = project_client.agents.messages.get_last_message_text_by_role(
+            thread_id=thread_id,
+            role=MessageRole.AGENT,
+        )
+        if reply:
+            yield reply.text.value
+        return
+
+    # Consome o stream do run, tratando tool calls assim que forem solicitadas.
+    # A resposta vem dos eventos de delta, sem buscar o histórico da thread.
+    with project_client.agents.runs.stream(
+        thread_id=thread_id,
+        agent_id=agent_id,
+    ) as stream:
+        for event_type, event_data, _ in stream:
+            if isinstance(event_data, MessageDeltaChunk):
+                yield event_data.text
+
+            elif isinstance(event_data, ThreadRun):
+                if event_data.status == "requires_action" and isinstance(
+                    event_data.required_action, SubmitToolOutputsAction
+                ):
+                    tool_calls = event_data.required_action.submit_tool_outputs.tool_calls
+                    tool_outputs = process_tool_calls(tool_calls, image_data)
+                    # Continua consumindo eventos no mesmo stream
+                    project_client.agents.runs.submit_tool_outputs_stream(
+                        thread_id=thread_id,
+                        run_id=event_data.id,
+                        tool_outputs=tool_outputs,
+                        event_handler=stream,
+                    )
+                elif event_data.status in RUN_FAILED_STATUSES:
+                    raise RuntimeError(f"Erro no run (status {event_data.status}): {event_data.last_error}")
+
+            elif event_type == AgentStreamEvent.ERROR:
+                raise RuntimeError(f"Erro no stream: {event_data}")
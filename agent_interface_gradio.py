@@ -1,61 +1,41 @@
 import os 
-import time
-import json
-import base64
+import atexit
+from concurrent.futures import ThreadPoolExecutor
+from importlib import import_module
 import gradio as gr
-from azure.ai.projects import AIProjectClient
-from azure.identity import DefaultAzureCredential
-from dotenv import load_dotenv
-from colorimetria import analisar_imagem
-from biotipo import classificar_biotipo
-from azure.ai.agents.models import (
-    FunctionTool,
-    MessageInputTextBlock,
-    MessageImageUrlParam,
-    MessageInputImageUrlBlock,
-    ListSortOrder,
-)
 
-# Carregar variáveis de ambiente
-load_dotenv()
+# Cliente, preparo de imagens, tool calls e execução dos runs ficam em
+# agent_core, compartilhados com o chat do terminal
+from agent_core import build_message_content, delete_uploaded_files, execute_run, get_project_client
 
-project_endpoint = os.environ["PROJECT_ENDPOINT"]
 agent_id = os.environ.get("AGENT_ID")
 
-project_client = AIProjectClient(
-    endpoint=project_endpoint,
-    credential=DefaultAzureCredential(),
-)
 
-functions = FunctionTool(functions=[analisar_imagem, classificar_biotipo])
-
-
-def image_file_to_base64(path: str) -> str:
-    with open(path, "rb") as f:
-        return base64.b64encode(f.read()).decode("utf-8")
-
-
-def process_tool_call(tool_call, image_base64=None):
-    tool_name = tool_call.function.name
-    if tool_name == "analisar_imagem":
-        try:
-            output = analisar_imagem(image_base64)
-            return json.dumps(output)
-        except Exception as e:
-            return json.dumps({"erro": str(e)})
-    elif tool_name == "classificar_biotipo":
-        try:
-            args = json.loads(tool_call.function.arguments)
-            output = classificar_biotipo(
-                args["ombro"],
-                args["cintura"],
-                args["quadril"],
-            )
-            return json.dumps(output)
-        except Exception as e:
-            return json.dumps({"erro": str(e)})
-    else:
-        return json.dumps({"erro": f"Ferramenta desconhecida: {tool_name}"})
+def create_session():
+    project_client = get_project_client()
+    thread = project_client.agents.threads.create()
+    agent = project_client.agents.get_agent(agent_id)
+    return thread, agent
+
+
+# Thread e agente são criados em segundo plano na inicialização, para que a
+# primeira mensagem não pague por isso (nem pelos imports do Azure SDK)
+session_executor = ThreadPoolExecutor(max_workers=1)
+session_future = session_executor.submit(create_session)
+# Na mesma thread, depois da sessão: importa e aquece a análise de colorimetria
+session_executor.submit(import_module, "colorimetria")
+
+# A thread dura enquanto o servidor estiver no ar: as imagens enviadas com
+# UPLOAD_IMAGES são apagadas ao encerrar
+atexit.register(delete_uploaded_files)
+
+
+def get_session():
+    global session_future
+    # Se a criação falhou (ex.: rede indisponível na inicialização), tenta de novo
+    if session_future.exception() is not None:
+        session_future = session_executor.submit(create_session)
+    return session_future.result()
 
 
 def gradio_agent_chat(message, history):
@@ -68,18 +48,11 @@ def gradio_agent_chat(message, history):
 
     Esta função:
     - Envia a mensagem (texto + imagem) para o agente
-    - Espera o run terminar (incluindo tool calls)
-    - Busca APENAS a última resposta do agente e retorna um único `yield`
+    - Consome o stream do run (incluindo tool calls)
+    - Faz `yield` da resposta parcial do agente à medida que os tokens chegam
     """
 
-    # Inicializar thread e agente na primeira mensagem
-    if not hasattr(gradio_agent_chat, "thread"):
-        gradio_agent_chat.thread = project_client.agents.threads.create()
-    if not hasattr(gradio_agent_chat, "agent"):
-        gradio_agent_chat.agent = project_client.agents.get_agent(agent_id)
-
-    thread = gradio_agent_chat.thread
-    agent = gradio_agent_chat.agent
+    thread, agent = get_session()
 
     # Extrair texto e arquivos do message (multimodal)
     if isinstance(message, dict):
@@ -90,122 +63,37 @@ def gradio_agent_chat(message, history):
         user_text = str(message or "").strip()
         files = []
 
-    content_blocks = []
-    image_base64 = None
-
-    # 1) Caso tenha arquivos enviados (imagem)
-    if files:
-        image_path = files[0]  # pega o primeiro arquivo
-        try:
-            image_base64 = image_file_to_base64(image_path)
-            img_data_url = f"data:image/png;base64,{image_base64}"
-            url_param = MessageImageUrlParam(url=img_data_url, detail="high")
-
-            # Se o usuário também mandou texto, incluímos junto
-            if user_text:
-                content_blocks.append(MessageInputTextBlock(text=user_text))
-            else:
-                content_blocks.append(
-                    MessageInputTextBlock(
-                        text="Enviei uma foto. Por favor, analise minha coloração pessoal."
-                    )
-                )
-
-            content_blocks.append(MessageInputImageUrlBlock(image_url=url_param))
-        except Exception as e:
-            # Garante pelo menos um yield (evita StopAsyncIteration)
-            yield f"Erro ao carregar a imagem enviada: {e}"
-            return
-
-    # 2) Caso não tenha arquivos, mas use o comando antigo "imagem:<caminho>"
-    elif user_text.lower().startswith("imagem:"):
-        image_path = user_text[7:].strip()
-        if os.path.exists(image_path):
-            try:
-                image_base64 = image_file_to_base64(image_path)
-                img_data_url = f"data:image/png;base64,{image_base64}"
-                url_param = MessageImageUrlParam(url=img_data_url, detail="high")
-
-                content_blocks = [
-                    MessageInputTextBlock(
-                        text="Enviei uma foto. Por favor, analise minha coloração pessoal."
-                    ),
-                    MessageInputImageUrlBlock(image_url=url_param),
-                ]
-            except Exception as e:
-                yield f"Erro ao carregar imagem: {e}"
-                return
-        else:
-            yield f"Arquivo não encontrado: {image_path}"
-            return
-
-    # 3) Apenas texto normal
-    else:
-        content_blocks = [MessageInputTextBlock(text=user_text or "")]
+    # Imagem anexada (pega o primeiro arquivo), comando antigo
+    # "imagem:<caminho>" ou apenas texto
+    image_path = files[0] if files else None
+    try:
+        content_blocks, image_data = build_message_content(user_text, image_path)
+    except FileNotFoundError:
+        # Garante pelo menos um yield (evita StopAsyncIteration)
+        yield f"Arquivo não encontrado: {image_path or user_text[7:].strip()}"
+        return
+    except Exception as e:
+        yield f"Erro ao carregar imagem: {e}"
+        return
 
     # Enviar mensagem ao agente
-    project_client.agents.messages.create(
+    get_project_client().agents.messages.create(
         thread_id=thread.id,
         role="user",
         content=content_blocks,
     )
 
-    # Criar run
-    run = project_client.agents.runs.create(
-        thread_id=thread.id,
-        agent_id=agent.id,
-    )
-
-    terminal_statuses = ["succeeded", "completed", "failed", "cancelled", "expired"]
-
-    # Espera o run terminar, tratando tool calls se necessário
-    while True:
-        if run.status == "requires_action":
-            tool_calls = run.required_action.submit_tool_outputs.tool_calls
-            tool_outputs = []
-            for tool_call in tool_calls:
-                output = process_tool_call(tool_call, image_base64)
-                tool_outputs.append(
-                    {
-                        "tool_call_id": tool_call.id,
-                        "output": output,
-                    }
-                )
-            project_client.agents.runs.submit_tool_outputs(
-                thread_id=thread.id,
-                run_id=run.id,
-                tool_outputs=tool_outputs,
-            )
-
-        if run.status in terminal_statuses:
-            break
-
-        time.sleep(1)
-        run = project_client.agents.runs.get(
-            thread_id=thread.id,
-            run_id=run.id,
-        )
-
-    # Buscar APENAS a última mensagem do agente
-    last_agent_text = None
-    messages = project_client.agents.messages.list(
-        thread_id=thread.id,
-        order=ListSortOrder.DESCENDING,  # mais recentes primeiro
-    )
-
-    for msg in messages:
-        # Ignora mensagens do usuário
-        if msg.role and msg.role.lower() == "user":
-            continue
-        if msg.text_messages:
-            last_text_block = msg.text_messages[-1]
-            last_agent_text = last_text_block.text.value
-            break
-
-    if last_agent_text:
-        # Sem prefixar com role
-        yield last_agent_text
-    else:
+    resposta = ""
+    try:
+        for texto in execute_run(thread.id, agent.id, image_data):
+            resposta += texto
+            yield resposta
+    except RuntimeError as e:
+        # Mantém o que já chegou da resposta e acrescenta o erro
+        yield f"{resposta}\n\n{e}".lstrip()
+        return
+
+    if not resposta:
         # fallback pra evitar StopAsyncIteration
         yield "Não foi possível obter uma resposta do agente. Verifique a configuração ou os logs."
 
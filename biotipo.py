@@ -5,6 +5,26 @@ Classifica o tipo de corpo baseado em medidas de ombro, cintura e quadril
 
 from typing import Dict
 
+import numpy as np
+
+
+# Regras de classificação em ordem de prioridade (a primeira verdadeira vence):
+# 1. Triângulo Invertido: Ombros > Quadris
+# 2. Oval: Cintura > Ombros e Cintura > Quadris
+# 3. Triângulo: Quadris > Ombros com Cintura Fina
+# 4. Ampulheta: Ombros = Quadris com Cintura Fina
+# 5. Retângulo: Todas as medidas aproximadamente iguais
+# 6. Triângulo: Quadris > Ombros mas cintura não é tão fina
+# 7. Retângulo: demais casos
+_BIOTIPOS = (
+    "Triângulo Invertido", "Oval", "Triângulo", "Ampulheta", "Retângulo", "Triângulo", "Retângulo"
+)
+
+
+def _close(a: float, b: float, tol: float) -> bool:
+    """Indica se duas medidas são aproximadamente iguais (diferença até tol)"""
+    return abs(a - b) <= tol
+
 
 def classificar_biotipo(ombro: float, cintura: float, quadril: float, tolerancia: float = 2.0) -> Dict[str, str]:
     """
@@ -18,68 +38,73 @@ def classificar_biotipo(ombro: float, cintura: float, quadril: float, tolerancia
     
     Returns:
         dict: Dicionário com:
-            - "biotipo": Nome do tipo corporal
+            - "biotipo": Nome do tipo corporal (None se a entrada for inválida)
+            - "status": "OK" ou "PARSE_ERR" quando a entrada é inválida
+            - "erro": Descrição do problema (apenas quando status é "PARSE_ERR")
     """
     
     # Validar entrada
-    if ombro <= 0 or cintura <= 0 or quadril <= 0:
+    try:
+        ombro, cintura, quadril = float(ombro), float(cintura), float(quadril)
+    except (TypeError, ValueError):
         return {
-            "erro": "Todas as medidas devem ser maiores que zero",
-            "biotipo": None
+            "erro": "As medidas devem ser numéricas",
+            "biotipo": None,
+            "status": "PARSE_ERR"
         }
-    
-    # Calcular diferenças
-    diff_ombro_quadril = ombro - quadril
-    diff_quadril_ombro = quadril - ombro
-
-    # Função auxiliar para verificar se dois valores são aproximadamente iguais
-    def sao_iguais(valor1: float, valor2: float, tol: float = tolerancia) -> bool:
-        return abs(valor1 - valor2) <= tol
-    
-    # Classificação
-    biotipo = None
-
-    
-    # 1. Triângulo Invertido: Ombros > Quadris
-    if diff_ombro_quadril > tolerancia:
-        biotipo = "Triângulo Invertido"
-
-    
-    # 2. Triângulo: Quadris > Ombros com Cintura Fina
-    elif diff_quadril_ombro > tolerancia and cintura < ombro and cintura < quadril:
-        biotipo = "Triângulo"
-
-    
-    # 3. Ampulheta: Ombros = Quadris com Cintura Fina
-    elif sao_iguais(ombro, quadril) and cintura < ombro and cintura < quadril:
-        biotipo = "Ampulheta"
 
+    if min(ombro, cintura, quadril) <= 0:
+        return {
+            "erro": "Todas as medidas devem ser maiores que zero",
+            "biotipo": None,
+            "status": "PARSE_ERR"
+        }
     
-    # 4. Oval: Cintura > Ombros e Cintura > Quadrils
-    elif cintura > ombro and cintura > quadril:
-        biotipo = "Oval"
+    # Condições na ordem das regras de _BIOTIPOS
+    cintura_fina = cintura < ombro and cintura < quadril
+    condicoes = (
+        ombro - quadril > tolerancia,
+        cintura > ombro and cintura > quadril,
+        quadril - ombro > tolerancia and cintura_fina,
+        cintura_fina,
+        _close(ombro, cintura, tolerancia) and _close(cintura, quadril, tolerancia),
+        quadril - ombro > tolerancia,
+        True,
+    )
+    biotipo = _BIOTIPOS[condicoes.index(True)]
 
-    # 5. Retângulo: Todas as medidas aproximadamente iguais
-    elif sao_iguais(ombro, cintura) and sao_iguais(cintura, quadril):
-        biotipo = "Retângulo"
+    return {"biotipo": biotipo, "status": "OK"}
 
-    
-    else:
-        # Se quadril > ombro mas cintura não é tão fina
-        if diff_quadril_ombro > tolerancia:
-            biotipo = "Triângulo"
 
-        # Se ombro > quadril
-        elif diff_ombro_quadril > tolerancia:
-            biotipo = "Triângulo Invertido"
+def classificar_biotipo_batch(ombros, cinturas, quadris, tolerancia: float = 2.0) -> np.ndarray:
+    """
+    Classifica vários conjuntos de medidas de uma vez (versão vetorizada de classificar_biotipo).
 
-        # Se cintura > ombro e quadril
-        elif cintura > ombro and cintura > quadril:
-            biotipo = "Oval"
+    Args:
+        ombros (array-like): Medidas de ombro em cm
+        cinturas (array-like): Medidas de cintura em cm
+        quadris (array-like): Medidas de quadril em cm
+        tolerancia (float): Margem de tolerância em cm para considerar medidas iguais (padrão: 2.0)
 
-        else:
-            biotipo = "Retângulo"
-    
-    return biotipo
+    Returns:
+        np.ndarray: Array (dtype object) com o nome do biotipo de cada entrada,
+            ou None quando alguma medida da entrada não é maior que zero
+    """
+    ombros = np.asarray(ombros, dtype=np.float64)
+    cinturas = np.asarray(cinturas, dtype=np.float64)
+    quadris = np.asarray(quadris, dtype=np.float64)
 
+    cintura_fina = (cinturas < ombros) & (cinturas < quadris)
+    condicoes = [
+        ombros - quadris > tolerancia,
+        (cinturas > ombros) & (cinturas > quadris),
+        (quadris - ombros > tolerancia) & cintura_fina,
+        cintura_fina,
+        (np.abs(ombros - cinturas) <= tolerancia) & (np.abs(cinturas - quadris) <= tolerancia),
+        quadris - ombros > tolerancia,
+    ]
+    biotipos = np.select(condicoes, _BIOTIPOS[:-1], default=_BIOTIPOS[-1]).astype(object)
 
+    validas = (ombros > 0) & (cinturas > 0) & (quadris > 0)
+    biotipos[~validas] = None
+    return biotipos
@@ -6,11 +6,98 @@ Análise de imagens para identificação de coloração pessoal (entrada via byt
 
 import numpy as np
 import cv2
-from typing import Dict, Tuple, List, Optional
+from typing import ClassVar, Dict, Tuple, List, Literal, Optional
 from dataclasses import dataclass
 from enum import Enum
-from sklearn.cluster import KMeans
 import base64
+import os
+import re
+import struct
+
+
+# sRGB (0-255) -> RGB linear, tabelado uma vez para os 256 valores possíveis
+_SRGB_LUT = np.arange(256) / 255.0
+_SRGB_LUT = np.where(_SRGB_LUT <= 0.04045, _SRGB_LUT / 12.92, ((_SRGB_LUT + 0.055) / 1.055) ** 2.4)
+
+# sRGB linear -> XYZ (colunas X, Y, Z) e branco de referência D65
+_M_SRGB_TO_XYZ = np.array([
+    [0.4124, 0.2126, 0.0193],
+    [0.3576, 0.7152, 0.1192],
+    [0.1805, 0.0722, 0.9505],
+])
+_WP_D65 = np.array([0.95047, 1.00000, 1.08883])
+_M_XYZ_TO_SRGB = np.linalg.inv(_M_SRGB_TO_XYZ)
+
+# Byte -> dois dígitos hexadecimais, para montar '#RRGGBB' sem formatar canal a canal
+_BYTE_HEX = np.array([f"{i:02x}" for i in range(256)])
+
+
+# Strings maiores que isso não podem ser caminhos (PATH_MAX do Linux)
+_MAX_TAMANHO_CAMINHO = 4096
+
+# Alfabeto base64 (com padding e quebras de linha)
+_BASE64_RE = re.compile(r"[A-Za-z0-9+/=\s]+")
+
+# Máximo de pixels passados ao k-means; uma amostra desse tamanho já dá os
+# mesmos centróides que a imagem inteira
+_MAX_PIXELS_KMEANS = 20000
+
+# Fatores de redução que o libjpeg aplica durante a decodificação
+_REDUCOES_JPEG = ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4), (2, cv2.IMREAD_REDUCED_COLOR_2))
+
+# Marcadores SOF (início de quadro) do JPEG, que trazem as dimensões da imagem
+_MARCADORES_SOF = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+def _dimensoes_jpeg(dados: bytes) -> Optional[Tuple[int, int]]:
+    """Lê (altura, largura) do cabeçalho de um JPEG sem decodificá-lo; None se não for JPEG"""
+    if not dados.startswith(b"\xff\xd8"):
+        return None
+    pos = 2
+    while pos + 4 <= len(dados):
+        if dados[pos] != 0xFF:
+            return None
+        marcador = dados[pos + 1]
+        if marcador == 0xFF:
+            # Byte de preenchimento antes do marcador
+            pos += 1
+            continue
+        if marcador == 0x01 or 0xD0 <= marcador <= 0xD7:
+            # Marcadores sem segmento de dados
+            pos += 2
+            continue
+        (tamanho,) = struct.unpack_from(">H", dados, pos + 2)
+        if marcador in _MARCADORES_SOF:
+            if pos + 9 > len(dados):
+                return None
+            return struct.unpack_from(">HH", dados, pos + 5)
+        pos += 2 + tamanho
+    return None
+
+
+def _f_lab(t: np.ndarray) -> np.ndarray:
+    """Função f(t) da conversão XYZ -> Lab (raiz cúbica com trecho linear perto de zero)"""
+    delta = 6 / 29
+    return np.where(t > delta ** 3, np.cbrt(t), t / (3 * delta ** 2) + 4 / 29)
+
+
+def _rgbs_to_lab(rgbs: np.ndarray) -> np.ndarray:
+    """Converte um array (N, 3) de cores RGB (inteiros 0-255) para Lab (D65) em float64"""
+    xyz = _SRGB_LUT[rgbs] @ _M_SRGB_TO_XYZ / _WP_D65
+    f = _f_lab(xyz)
+    fx, fy, fz = f[:, 0], f[:, 1], f[:, 2]
+    return np.stack((116 * fy - 16, 500 * (fx - fy), 200 * (fy - fz)), axis=1)
+
+
+def _labs_to_rgbs(labs: np.ndarray) -> np.ndarray:
+    """Converte um array (N, 3) de cores Lab (D65) para RGB uint8 (inverso de _rgbs_to_lab)"""
+    fy = (labs[:, 0] + 16) / 116
+    f = np.stack((fy + labs[:, 1] / 500, fy, fy - labs[:, 2] / 200), axis=1)
+    delta = 6 / 29
+    xyz = np.where(f > delta, f ** 3, 3 * delta ** 2 * (f - 4 / 29)) * _WP_D65
+    linear = np.clip(xyz @ _M_XYZ_TO_SRGB, 0, 1)
+    srgb = np.where(linear <= 0.0031308, linear * 12.92, 1.055 * linear ** (1 / 2.4) - 0.055)
+    return np.rint(srgb * 255).astype(np.uint8)
 
 
 class Estacao(Enum):
@@ -21,6 +108,13 @@ class Estacao(Enum):
     INVERNO = "Inverno"
 
 
+# Rótulos indexados pelos códigos guardados nos arrays de AnalisePaleta
+_ESTACOES = tuple(Estacao)
+_TEMPERATURAS = ("quente", "fria")
+_SATURACOES = ("baixa", "media", "alta")
+_LUMINOSIDADES = ("escura", "media", "clara")
+
+
 @dataclass
 class AnaliseCor:
     """Resultado da análise de uma cor"""
@@ -37,8 +131,20 @@ class AnaliseCor:
 
 @dataclass
 class AnalisePaleta:
-    """Resultado da análise de paleta extraída de imagem"""
-    cores_principais: List[AnaliseCor]
+    """
+    Resultado da análise de paleta extraída de imagem
+    Um array por atributo, com uma linha por cor principal (em ordem de frequência);
+    os atributos categóricos são códigos indexando _ESTACOES, _TEMPERATURAS etc.
+    """
+    rgb: np.ndarray           # (k, 3) uint8
+    hex: List[str]
+    hsv: np.ndarray           # (k, 3)
+    lab: np.ndarray           # (k, 3)
+    temperatura: np.ndarray   # (k,) códigos em _TEMPERATURAS
+    saturacao: np.ndarray     # (k,) códigos em _SATURACOES
+    luminosidade: np.ndarray  # (k,) códigos em _LUMINOSIDADES
+    estacao: np.ndarray       # (k,) códigos em _ESTACOES
+    confianca: np.ndarray     # (k,)
     estacao_dominante: Estacao
     proporcao_quente_fria: Tuple[int, int]
     proporcao_saturacao: Dict[str, int]
@@ -46,15 +152,49 @@ class AnalisePaleta:
     confianca_geral: float
     imagem_processada: Optional[np.ndarray] = None
 
+    @property
+    def cores_principais(self) -> List[AnaliseCor]:
+        """Cores principais como registros AnaliseCor (montados sob demanda)"""
+        return [
+            AnaliseCor(
+                rgb=tuple(rgb),
+                hex=cor_hex,
+                hsv=tuple(hsv),
+                lab=tuple(lab),
+                temperatura=_TEMPERATURAS[temperatura],
+                saturacao=_SATURACOES[saturacao],
+                luminosidade=_LUMINOSIDADES[luminosidade],
+                estacao=_ESTACOES[estacao],
+                confianca=confianca,
+            )
+            for rgb, cor_hex, hsv, lab, temperatura, saturacao, luminosidade, estacao, confianca in zip(
+                self.rgb.tolist(), self.hex, self.hsv.tolist(), self.lab.tolist(),
+                self.temperatura.tolist(), self.saturacao.tolist(), self.luminosidade.tolist(),
+                self.estacao.tolist(), self.confianca.tolist(),
+            )
+        ]
+
 
 class ProcessadorImagem:
     """Processa imagens para extrair paletas de cores relevantes para a análise"""
 
     @staticmethod
-    def carregar_imagem_bytes(imagem_bytes: bytes) -> np.ndarray:
-        """Carrega uma imagem a partir de bytes e converte para RGB"""
+    def carregar_imagem_bytes(imagem_bytes: bytes, max_dimensao: Optional[int] = None) -> np.ndarray:
+        """
+        Carrega uma imagem a partir de bytes e converte para RGB
+        max_dimensao: se informado, JPEGs grandes já são decodificados reduzidos
+        (1/2, 1/4 ou 1/8), mantendo o maior lado >= max_dimensao
+        """
+        flag = cv2.IMREAD_COLOR
+        dimensoes = _dimensoes_jpeg(imagem_bytes) if max_dimensao else None
+        if dimensoes:
+            for fator, flag_reduzida in _REDUCOES_JPEG:
+                if max(dimensoes) / fator >= max_dimensao:
+                    flag = flag_reduzida
+                    break
+
         nparr = np.frombuffer(imagem_bytes, np.uint8)
-        img_bgr = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        img_bgr = cv2.imdecode(nparr, flag)
         if img_bgr is None:
             raise ValueError("Não foi possível decodificar a imagem. Verifique o formato.")
         img_rgb = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2RGB)
@@ -68,7 +208,10 @@ class ProcessadorImagem:
             escala = max_dimensao / max(altura, largura)
             nova_altura = int(altura * escala)
             nova_largura = int(largura * escala)
-            imagem = cv2.resize(imagem, (nova_largura, nova_altura), interpolation=cv2.INTER_AREA)
+            # INTER_AREA só compensa em reduções maiores que 2x; perto de 1x o
+            # bilinear é mais rápido e igual para a extração de cores
+            interpolacao = cv2.INTER_LINEAR if escala > 0.5 else cv2.INTER_AREA
+            imagem = cv2.resize(imagem, (nova_largura, nova_altura), interpolation=interpolacao)
         return imagem
 
     @staticmethod
@@ -77,14 +220,12 @@ class ProcessadorImagem:
         Remove background muito claro ou muito escuro (simplificação via canal L do LAB)
         sensibilidade: 0-1, quanto maior, mais agressivo
         """
-        img_lab = cv2.cvtColor(imagem, cv2.COLOR_RGB2LAB)
-        l_channel = img_lab[:, :, 0]
+        l_channel = cv2.cvtColor(imagem, cv2.COLOR_RGB2LAB)[:, :, 0]
         limiar_inferior = int(255 * sensibilidade * 0.2)
         limiar_superior = int(255 * (1 - sensibilidade * 0.2))
         mascara = (l_channel > limiar_inferior) & (l_channel < limiar_superior)
-        imagem_filtrada = imagem.copy()
-        imagem_filtrada[~mascara] = [255, 255, 255]  # Fundo branco
-        return imagem_filtrada
+        # Uma única passada gera a imagem filtrada, com fundo branco
+        return np.where(mascara[..., None], imagem, np.uint8(255))
 
     @staticmethod
     def extrair_cores_dominantes(imagem: np.ndarray, n_cores: int = 5, remover_bg: bool = True) -> List[Tuple[int, int, int]]:
@@ -92,56 +233,85 @@ class ProcessadorImagem:
         Extrai as cores dominantes da imagem usando K-means clustering
         Retorna lista de cores RGB em ordem de frequência
         """
-        img_processada = imagem.copy()
-        if remover_bg:
-            img_processada = ProcessadorImagem.remover_background(img_processada)
+        rgb, _ = ProcessadorImagem.extrair_cores_dominantes_lab(imagem, n_cores=n_cores, remover_bg=remover_bg)
+        return [tuple(cor) for cor in rgb.tolist()]
+
+    @staticmethod
+    def extrair_cores_dominantes_lab(
+        imagem: np.ndarray, n_cores: int = 5, remover_bg: bool = True
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Extrai as cores dominantes agrupando os pixels no espaço Lab, onde a
+        distância acompanha a diferença percebida entre as cores
+        Retorna (rgb, lab): arrays (k, 3) uint8 e float64 em ordem de frequência
+        """
+        # remover_background já devolve um array novo e o resto só lê a imagem
+        img_processada = ProcessadorImagem.remover_background(imagem) if remover_bg else imagem
 
         # Remove pixels muito claros (tende a ser fundo)
-        mascara_background = (img_processada.sum(axis=2) < 750)
+        mascara_background = np.einsum('ijk->ij', img_processada, dtype=np.int32) < 750
         pixels_validos = img_processada[mascara_background]
         if len(pixels_validos) < 100:
             pixels_validos = img_processada.reshape(-1, 3)
 
-        unique_colors = len(np.unique(pixels_validos, axis=0))
-        k = max(1, min(n_cores, unique_colors))
-
-        kmeans = KMeans(n_clusters=k, random_state=42, n_init=10)
-        kmeans.fit(pixels_validos)
+        # Amostra uniforme com semente fixa: o mesmo resultado a cada chamada
+        if len(pixels_validos) > _MAX_PIXELS_KMEANS:
+            rng = np.random.default_rng(42)
+            indices = rng.choice(len(pixels_validos), _MAX_PIXELS_KMEANS, replace=False)
+            pixels_validos = pixels_validos[np.sort(indices)]
 
-        labels = kmeans.labels_
-        frequencias = np.bincount(labels)
-        indices_ordenados = np.argsort(-frequencias)
+        # Cores distintas contadas sobre o RGB empacotado em um uint32 (unique 1-D,
+        # bem mais barato que np.unique(axis=0) sobre linhas)
+        packed = pixels_validos.astype(np.uint32) @ np.array([1 << 16, 1 << 8, 1], dtype=np.uint32)
+        unique_colors = np.unique(packed).size
+        k = max(1, min(n_cores, unique_colors))
 
-        cores = []
-        for idx in indices_ordenados:
-            cor = tuple(int(x) for x in kmeans.cluster_centers_[idx])
-            cores.append(cor)
+        # K-means do OpenCV em Lab (float32, k-means++ com 3 tentativas); semente
+        # fixa para resultados reproduzíveis
+        cv2.setRNGSeed(42)
+        _, labels, centros = cv2.kmeans(
+            _rgbs_to_lab(pixels_validos).astype(np.float32),
+            k,
+            None,
+            (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 10, 1.0),
+            3,
+            cv2.KMEANS_PP_CENTERS,
+        )
 
-        return cores
+        frequencias = np.bincount(labels.ravel(), minlength=k)
+        lab = centros[np.argsort(-frequencias)].astype(np.float64)
+        return _labs_to_rgbs(lab), lab
 
 
 class ColorimetriaAnalyzer:
     """Analisador de colorimetria pessoal (somente rotas usadas por analisar_imagem_bytes)"""
 
-    def __init__(self):
-        self.paleta_estacoes = self._definir_paleta_estacoes()
+    # Cores características de cada estação, como tuplas imutáveis compartilhadas
+    # por todas as instâncias
+    paleta_estacoes: ClassVar[Tuple[Tuple[Estacao, Tuple[Tuple[int, int, int], ...]], ...]] = (
+        (Estacao.PRIMAVERA, (
+            (255, 182, 193), (144, 238, 144), (255, 218, 185), (173, 255, 47), (255, 240, 245)
+        )),
+        (Estacao.VERAO, (
+            (0, 191, 255), (0, 255, 255), (255, 255, 0), (144, 238, 144), (255, 105, 180)
+        )),
+        (Estacao.OUTONO, (
+            (184, 92, 23), (255, 140, 0), (210, 105, 30), (189, 183, 107), (205, 92, 92)
+        )),
+        (Estacao.INVERNO, (
+            (0, 0, 0), (255, 0, 0), (0, 0, 255), (255, 255, 255), (192, 192, 192)
+        )),
+    )
 
-    def _definir_paleta_estacoes(self) -> Dict[Estacao, List[Tuple[int, int, int]]]:
-        """Define cores características de cada estação"""
-        return {
-            Estacao.PRIMAVERA: [
-                (255, 182, 193), (144, 238, 144), (255, 218, 185), (173, 255, 47), (255, 240, 245)
-            ],
-            Estacao.VERAO: [
-                (0, 191, 255), (0, 255, 255), (255, 255, 0), (144, 238, 144), (255, 105, 180)
-            ],
-            Estacao.OUTONO: [
-                (184, 92, 23), (255, 140, 0), (210, 105, 30), (189, 183, 107), (205, 92, 92)
-            ],
-            Estacao.INVERNO: [
-                (0, 0, 0), (255, 0, 0), (0, 0, 255), (255, 255, 255), (192, 192, 192)
-            ]
-        }
+    def __init__(self):
+        # Lab da paleta calculado uma única vez: (estações, cores, 3), somente leitura
+        # As estações seguem a ordem de _ESTACOES, a mesma dos códigos de AnalisePaleta
+        paleta = dict(self.paleta_estacoes)
+        self._estacoes = _ESTACOES
+        self._paleta_lab = self.rgbs_para_lab(
+            [cor for estacao in self._estacoes for cor in paleta[estacao]]
+        ).reshape(len(self._estacoes), -1, 3)
+        self._paleta_lab.flags.writeable = False
 
     @staticmethod
     def hex_para_rgb(hex_color: str) -> Tuple[int, int, int]:
@@ -155,53 +325,47 @@ class ColorimetriaAnalyzer:
         return f"#{rgb[0]:02x}{rgb[1]:02x}{rgb[2]:02x}"
 
     @staticmethod
-    def rgb_para_hsv(rgb: Tuple[int, int, int]) -> Tuple[float, float, float]:
-        """Converte RGB para HSV (H em 0-360, S/V em 0-100)"""
-        r, g, b = [x / 255.0 for x in rgb]
-        max_val = max(r, g, b)
-        min_val = min(r, g, b)
-        delta = max_val - min_val
-
-        if delta == 0:
-            h = 0
-        elif max_val == r:
-            h = 60 * (((g - b) / delta) % 6)
-        elif max_val == g:
-            h = 60 * (((b - r) / delta) + 2)
-        else:
-            h = 60 * (((r - g) / delta) + 4)
+    def rgbs_para_hex(rgbs: np.ndarray) -> List[str]:
+        """Converte um array (N, 3) uint8 de cores RGB para hexadecimal"""
+        r, g, b = _BYTE_HEX[rgbs[:, 0]], _BYTE_HEX[rgbs[:, 1]], _BYTE_HEX[rgbs[:, 2]]
+        return np.char.add(np.char.add(np.char.add("#", r), g), b).tolist()
 
-        s = 0 if max_val == 0 else (delta / max_val) * 100
+    @staticmethod
+    def rgbs_para_hsv(rgbs) -> np.ndarray:
+        """Converte um array (N, 3) de cores RGB para HSV (H em 0-360, S/V em 0-100)"""
+        rgb = np.asarray(rgbs, dtype=np.uint8).reshape(-1, 3) / 255.0
+        r, g, b = rgb[:, 0], rgb[:, 1], rgb[:, 2]
+        max_val = rgb.max(axis=1)
+        delta = max_val - rgb.min(axis=1)
+
+        # Todos os ramos calculados de uma vez; divisor 1 onde delta/max são 0
+        # (esses casos são descartados pelo np.select / np.where)
+        divisor = np.where(delta == 0, 1.0, delta)
+        h = np.select(
+            [delta == 0, max_val == r, max_val == g],
+            [0.0, 60 * (((g - b) / divisor) % 6), 60 * (((b - r) / divisor) + 2)],
+            60 * (((r - g) / divisor) + 4),
+        )
+        s = np.where(max_val == 0, 0.0, delta / np.where(max_val == 0, 1.0, max_val) * 100)
         v = max_val * 100
+        return np.stack((h, s, v), axis=1)
+
+    @staticmethod
+    def rgb_para_hsv(rgb: Tuple[int, int, int]) -> Tuple[float, float, float]:
+        """Converte RGB para HSV (H em 0-360, S/V em 0-100)"""
+        h, s, v = ColorimetriaAnalyzer.rgbs_para_hsv([rgb])[0].tolist()
         return (h, s, v)
 
+    @staticmethod
+    def rgbs_para_lab(rgbs) -> np.ndarray:
+        """Converte um array (N, 3) de cores RGB para Lab (D65) em uma única chamada"""
+        return _rgbs_to_lab(np.asarray(rgbs, dtype=np.uint8).reshape(-1, 3))
+
     @staticmethod
     def rgb_para_lab(rgb: Tuple[int, int, int]) -> Tuple[float, float, float]:
         """Converte RGB para Lab (D65)"""
-        r, g, b = [x / 255.0 for x in rgb]
-
-        def srgb_to_linear(c):
-            return c / 12.92 if c <= 0.04045 else ((c + 0.055) / 1.055) ** 2.4
-
-        r, g, b = srgb_to_linear(r), srgb_to_linear(g), srgb_to_linear(b)
-
-        x = r * 0.4124 + g * 0.3576 + b * 0.1805
-        y = r * 0.2126 + g * 0.7152 + b * 0.0722
-        z = r * 0.0193 + g * 0.1192 + b * 0.9505
-
-        x /= 0.95047
-        y /= 1.00000
-        z /= 1.08883
-
-        def f(t):
-            delta = 6 / 29
-            return t ** (1/3) if t > delta ** 3 else t / (3 * delta ** 2) + 4 / 29
-
-        fx, fy, fz = f(x), f(y), f(z)
-        L = 116 * fy - 16
-        a = 500 * (fx - fy)
-        b_val = 200 * (fy - fz)
-        return (L, a, b_val)
+        L, a, b = ColorimetriaAnalyzer.rgbs_para_lab([rgb])[0].tolist()
+        return (L, a, b)
 
     def classificar_temperatura(self, h: float, a: float) -> str:
         """Classifica a cor como quente ou fria a partir de H (HSV) e a (Lab)"""
@@ -237,18 +401,36 @@ class ColorimetriaAnalyzer:
 
     def classificar_estacao(self, rgb: Tuple[int, int, int], lab: Tuple[float, float, float]) -> Tuple[Estacao, float]:
         """Classifica a cor em uma estação e retorna (estacao, confiança)"""
-        distancias = {}
-        for estacao, paleta in self.paleta_estacoes.items():
-            dist_paleta = [
-                self.calcular_distancia_lab(lab, self.rgb_para_lab(cor))
-                for cor in paleta
-            ]
-            distancias[estacao] = min(dist_paleta)
+        codigos, confiancas = self._classificar_estacoes_batch(np.asarray(lab, dtype=np.float64).reshape(1, 3))
+        return self._estacoes[codigos[0]], float(confiancas[0])
 
-        estacao_minima = min(distancias, key=distancias.get)
-        dist_minima = distancias[estacao_minima]
-        confianca = max(0, 1 - (dist_minima / 100))
-        return estacao_minima, confianca
+    def _classificar_estacoes_batch(self, labs: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Classifica um array (k, 3) de cores Lab de uma vez
+        Retorna (códigos em _ESTACOES, confianças), ambos com k elementos
+        """
+        # Distância quadrática até cada cor da paleta: (cores, estações, cores da paleta)
+        diff = labs[:, None, None, :] - self._paleta_lab[None, ...]
+        d2_por_estacao = np.einsum('ksjc,ksjc->ksj', diff, diff).min(axis=2)
+        codigos = d2_por_estacao.argmin(axis=1)
+        dist_minima = np.sqrt(d2_por_estacao[np.arange(len(labs)), codigos])
+        confiancas = np.clip(1 - dist_minima / 100, 0, None)
+        return codigos.astype(np.int8), confiancas
+
+    def _classificar_cores(self, hsv: np.ndarray, lab: np.ndarray) -> Tuple[np.ndarray, ...]:
+        """
+        Classifica arrays (k, 3) de HSV e Lab de uma vez, com as mesmas regras de
+        classificar_temperatura/_saturacao/_luminosidade e classificar_estacao
+        Retorna (temperatura, saturacao, luminosidade, estacao, confianca): os
+        quatro primeiros como códigos int8 (índices de _TEMPERATURAS etc.)
+        """
+        h, s, v = hsv[:, 0] % 360, hsv[:, 1], hsv[:, 2]
+        fria = (h > 60) & (h < 330) & (((h >= 120) & (h <= 240)) | (lab[:, 1] <= 0))
+        temperatura = fria.astype(np.int8)
+        saturacao = np.digitize(s, [30, 70]).astype(np.int8)
+        luminosidade = np.digitize(v, [35, 65]).astype(np.int8)
+        estacao, confianca = self._classificar_estacoes_batch(lab)
+        return temperatura, saturacao, luminosidade, estacao, confianca
 
     def analisar_cor(self, cor_hex: str) -> AnaliseCor:
         """Análise completa de uma cor em hexadecimal '#RRGGBB'"""
@@ -274,50 +456,62 @@ class ColorimetriaAnalyzer:
             confianca=confianca
         )
 
-    def analisar_imagem_bytes(self, imagem_bytes: bytes, n_cores: int = 5, remover_background: bool = True) -> AnalisePaleta:
+    def analisar_imagem_bytes(
+        self,
+        imagem_bytes: bytes,
+        n_cores: int = 5,
+        remover_background: bool = True,
+        keep_image: bool = False,
+    ) -> AnalisePaleta:
         """
         Análise de imagem a partir de bytes (requisição HTTP)
         Retorna AnalisePaleta com cores principais e estatísticas
+        keep_image: inclui a imagem redimensionada em imagem_processada (por
+        padrão ela não é retida no resultado)
         """
-        img = ProcessadorImagem.carregar_imagem_bytes(imagem_bytes)
+        img = ProcessadorImagem.carregar_imagem_bytes(imagem_bytes, max_dimensao=800)
         img_redimensionada = ProcessadorImagem.redimensionar_imagem(img)
 
-        cores_rgb = ProcessadorImagem.extrair_cores_dominantes(
+        # Centróides já vêm em Lab; o RGB é usado para HSV, hex e a resposta
+        rgb, lab = ProcessadorImagem.extrair_cores_dominantes_lab(
             img_redimensionada,
             n_cores=n_cores,
             remover_bg=remover_background
         )
+        hsv = self.rgbs_para_hsv(rgb)
+        temperatura, saturacao, luminosidade, estacao, confianca = self._classificar_cores(hsv, lab)
 
-        cores_hex = [self.rgb_para_hex(cor) for cor in cores_rgb]
-        analises = [self.analisar_cor(hex_cor) for hex_cor in cores_hex]
-
-        contagem_estacoes: Dict[Estacao, int] = {}
-        contagem_temperatura = {"quente": 0, "fria": 0}
-        contagem_saturacao = {"baixa": 0, "media": 0, "alta": 0}
-        contagem_luminosidade = {"escura": 0, "media": 0, "clara": 0}
-        confiancas = []
-
-        for analise in analises:
-            est = analise.estacao
-            contagem_estacoes[est] = contagem_estacoes.get(est, 0) + 1
-            contagem_temperatura[analise.temperatura] += 1
-            contagem_saturacao[analise.saturacao] += 1
-            contagem_luminosidade[analise.luminosidade] += 1
-            confiancas.append(analise.confianca)
-
-        estacao_dominante = max(contagem_estacoes, key=contagem_estacoes.get)
-        confianca_geral = float(np.mean(confiancas)) if confiancas else 0.0
+        # Estação dominante: a mais frequente; no empate, a que aparece primeiro
+        contagem_estacoes = np.bincount(estacao, minlength=len(_ESTACOES))
+        primeira_mais_frequente = np.argmax(contagem_estacoes[estacao] == contagem_estacoes.max())
+        estacao_dominante = _ESTACOES[estacao[primeira_mais_frequente]]
+        confianca_geral = float(confianca.mean())
 
+        contagem_temperatura = np.bincount(temperatura, minlength=len(_TEMPERATURAS)).tolist()
         return AnalisePaleta(
-            cores_principais=analises,
+            rgb=rgb,
+            hex=self.rgbs_para_hex(rgb),
+            hsv=hsv,
+            lab=lab,
+            temperatura=temperatura,
+            saturacao=saturacao,
+            luminosidade=luminosidade,
+            estacao=estacao,
+            confianca=confianca,
             estacao_dominante=estacao_dominante,
-            proporcao_quente_fria=(contagem_temperatura["quente"], contagem_temperatura["fria"]),
-            proporcao_saturacao=contagem_saturacao,
-            proporcao_luminosidade=contagem_luminosidade,
+            proporcao_quente_fria=(contagem_temperatura[0], contagem_temperatura[1]),
+            proporcao_saturacao=dict(zip(_SATURACOES, np.bincount(saturacao, minlength=3).tolist())),
+            proporcao_luminosidade=dict(zip(_LUMINOSIDADES, np.bincount(luminosidade, minlength=3).tolist())),
             confianca_geral=confianca_geral,
-            imagem_processada=img_redimensionada
+            imagem_processada=img_redimensionada if keep_image else None
         )
-    
+
+
+# Analisador único do processo: a paleta Lab é calculada uma só vez e o estado
+# não muda depois do __init__, então pode ser compartilhado entre requisições
+_ANALYZER = ColorimetriaAnalyzer()
+
+
 def analisar_imagem(imagem_dados, n_cores=5, remover_background=True):
     """
     Analisa uma imagem fornecida como bytes, base64 ou arquivo e retorna informações de colorimetria.
@@ -325,7 +519,7 @@ def analisar_imagem(imagem_dados, n_cores=5, remover_background=True):
     Args:
         imagem_dados: Pode ser:
             - bytes: dados brutos da imagem
-            - str (base64): string codificada em base64
+            - str (base64): string codificada em base64 (ou data URL)
             - str (caminho): caminho para o arquivo de imagem
         n_cores (int): Número de cores a extrair (padrão: 5).
         remover_background (bool): Indica se o background deve ser removido (padrão: True).
@@ -337,11 +531,15 @@ def analisar_imagem(imagem_dados, n_cores=5, remover_background=True):
         # Converter para bytes se necessário
         imagem_bytes = _converter_para_bytes(imagem_dados)
         
-        # Criar analisador e processar
-        analyzer = ColorimetriaAnalyzer()
-        analise = analyzer.analisar_imagem_bytes(imagem_bytes, n_cores=n_cores, 
+        # Processar com o analisador compartilhado
+        analise = _ANALYZER.analisar_imagem_bytes(imagem_bytes, n_cores=n_cores, 
                                                 remover_background=remover_background)
 
+        # Arredondamentos feitos de uma vez sobre os arrays da análise
+        hsvs = np.round(analise.hsv, 2).tolist()
+        labs = np.round(analise.lab, 2).tolist()
+        confiancas = np.round(analise.confianca, 3).tolist()
+
         # Formatar resposta
         return {
             "estacao_dominante": analise.estacao_dominante.value,
@@ -354,25 +552,29 @@ def analisar_imagem(imagem_dados, n_cores=5, remover_background=True):
             "proporcao_luminosidade": analise.proporcao_luminosidade,
             "cores_principais": [
                 {
-                    "hex": cor.hex,
-                    "rgb": list(cor.rgb),
+                    "hex": cor_hex,
+                    "rgb": rgb,
                     "hsv": {
-                        "hue": round(cor.hsv[0], 2),
-                        "saturation": round(cor.hsv[1], 2),
-                        "value": round(cor.hsv[2], 2)
+                        "hue": hsv[0],
+                        "saturation": hsv[1],
+                        "value": hsv[2]
                     },
                     "lab": {
-                        "L": round(cor.lab[0], 2),
-                        "a": round(cor.lab[1], 2),
-                        "b": round(cor.lab[2], 2)
+                        "L": lab[0],
+                        "a": lab[1],
+                        "b": lab[2]
                     },
-                    "temperatura": cor.temperatura,
-                    "saturacao": cor.saturacao,
-                    "luminosidade": cor.luminosidade,
-                    "estacao": cor.estacao.value,
-                    "confianca": round(cor.confianca, 3)
+                    "temperatura": _TEMPERATURAS[temperatura],
+                    "saturacao": _SATURACOES[saturacao],
+                    "luminosidade": _LUMINOSIDADES[luminosidade],
+                    "estacao": _ESTACOES[estacao].value,
+                    "confianca": confianca
                 }
-                for cor in analise.cores_principais
+                for cor_hex, rgb, hsv, lab, temperatura, saturacao, luminosidade, estacao, confianca in zip(
+                    analise.hex, analise.rgb.tolist(), hsvs, labs,
+                    analise.temperatura.tolist(), analise.saturacao.tolist(),
+                    analise.luminosidade.tolist(), analise.estacao.tolist(), confiancas,
+                )
             ]
         }
 
@@ -381,34 +583,59 @@ def analisar_imagem(imagem_dados, n_cores=5, remover_background=True):
     except Exception as e:
         raise Exception(f"Erro ao processar: {str(e)}")
 
-def _converter_para_bytes(imagem_dados):
+def _decodificar_base64(texto: str) -> bytes:
+    """Decodifica base64, aceitando também data URLs ("data:image/...;base64,<dados>")"""
+    data_url = texto.startswith("data:")
+    try:
+        return base64.b64decode(texto.partition(",")[2] if data_url else texto)
+    except Exception:
+        raise ValueError("Data URL com conteúdo base64 inválido" if data_url else "Conteúdo base64 inválido")
+
+
+def _parece_base64(texto: str) -> bool:
+    """Identifica payloads base64 sem tocar no disco: longos demais para um caminho e só com caracteres base64"""
+    return len(texto) > _MAX_TAMANHO_CAMINHO and _BASE64_RE.fullmatch(texto, 0, 256) is not None
+
+
+def _converter_para_bytes(imagem_dados, kind: Optional[Literal["bytes", "base64", "path"]] = None):
     """
     Converte dados de imagem em diferentes formatos para bytes.
     
     Args:
         imagem_dados: bytes, base64 string, ou caminho de arquivo
+        kind: formato da entrada, quando o chamador já o conhece; sem ele o
+            formato é identificado pelo conteúdo
         
     Returns:
         bytes: Dados da imagem em formato bytes
     """
+    if kind == "bytes":
+        return imagem_dados
+    if kind == "base64":
+        return _decodificar_base64(imagem_dados)
+    if kind == "path":
+        with open(imagem_dados, 'rb') as file:
+            return file.read()
+
     # Se for bytes, retornar diretamente
     if isinstance(imagem_dados, bytes):
         return imagem_dados
     
     # Se for string
     if isinstance(imagem_dados, str):
-        # Tentar abrir como arquivo primeiro
-        try:
+        # Data URL ou base64 longo: decodificar sem tentar abrir como arquivo
+        if imagem_dados.startswith("data:") or _parece_base64(imagem_dados):
+            return _decodificar_base64(imagem_dados)
+
+        if os.path.isfile(imagem_dados):
             with open(imagem_dados, 'rb') as file:
                 return file.read()
-        except (FileNotFoundError, IsADirectoryError, PermissionError):
-            pass
         
-        # Tentar decodificar como base64
+        # Texto curto que não é um arquivo: última tentativa como base64
         try:
             return base64.b64decode(imagem_dados)
         except Exception:
-            raise ValueError(f"Não foi possível interpretar a entrada como caminho de arquivo ou base64")
+            raise ValueError("Não foi possível interpretar a entrada como caminho de arquivo ou base64")
     
     # Verificar se é um objeto FileInfo (do Azure)
     if hasattr(imagem_dados, 'id') and hasattr(imagem_dados, 'filename'):
@@ -425,7 +652,7 @@ def analisar_imagem_arquivo(imagem_dados, n_cores=5, remover_background=True):
     Args:
         imagem_dados: Pode ser:
             - bytes: dados brutos da imagem
-            - str (base64): string codificada em base64
+            - str (base64): string codificada em base64 (ou data URL)
             - str (caminho): caminho para o arquivo de imagem
         n_cores (int): Número de cores a extrair (padrão: 5).
         remover_background (bool): Indica se o background deve ser removido (padrão: True).
@@ -440,3 +667,18 @@ def analisar_imagem_arquivo(imagem_dados, n_cores=5, remover_background=True):
             "erro": str(e),
             "tipo_erro": type(e).__name__
         }
+
+
+def _aquecer():
+    """Roda uma análise mínima para inicializar decodificador, k-means e NumPy antes da primeira requisição"""
+    y, x = np.mgrid[0:16, 0:16]
+    gradiente = np.stack((x * 16, y * 16, (x + y) * 8), axis=2).astype(np.uint8)
+    _, png = cv2.imencode(".png", gradiente)
+    _ANALYZER.analisar_imagem_bytes(png.tobytes())
+
+
+try:
+    _aquecer()
+except Exception:
+    # O aquecimento é só uma otimização: qualquer problema real aparece na primeira análise
+    pass
@@ -1,32 +1,46 @@
 import os
-from azure.ai.projects import AIProjectClient
-from azure.identity import DefaultAzureCredential
-from dotenv import load_dotenv
 from colorimetria import analisar_imagem
 from biotipo import classificar_biotipo
 from azure.ai.agents.models import FunctionTool
+# Cliente do projeto e ANALYSIS_MODE são os mesmos usados pelas interfaces
+from agent_core import ANALYSIS_MODE, get_project_client
 
-load_dotenv()
+project_client = get_project_client()
 
-project_endpoint = os.environ["PROJECT_ENDPOINT"] 
-
-project_client = AIProjectClient(
-    endpoint=project_endpoint,
-    credential=DefaultAzureCredential(),
-)
-
-functions = FunctionTool(functions=[analisar_imagem, classificar_biotipo])
+if ANALYSIS_MODE == "vision":
+    # A coloração é analisada pelo próprio modelo: a tool local não é registrada
+    functions = FunctionTool(functions=[classificar_biotipo])
+    ferramentas = """- classificar_biotipo(medida_ombro_cm, medida_cintura_cm, medida_quadril_cm): calcula e retorna o biotipo corporal com base nas medidas."""
+    etapa_imagem = """
+        2. Ao receber uma imagem:
+        - Sempre que o usuário enviar uma imagem, analise você mesmo a coloração pessoal a partir da foto
+            (temperatura, saturação, luminosidade e estação predominante).
+        - Apresente um resumo claro e didático da coloração pessoal obtida.
+        """
+else:
+    functions = FunctionTool(functions=[analisar_imagem, classificar_biotipo])
+    ferramentas = """- analisar_imagem(imagem_dados): analisa a imagem enviada e retorna informações sobre a coloração pessoal.
+        - classificar_biotipo(medida_ombro_cm, medida_cintura_cm, medida_quadril_cm): calcula e retorna o biotipo corporal com base nas medidas."""
+    etapa_imagem = """
+        2. Ao receber uma imagem:
+        - Sempre que o usuário enviar uma imagem, você DEVE chamar a função `analisar_imagem` com o arquivo recebido.
+        - A análise de coloração pessoal deve ser feita exclusivamente pela função.
+        - Após receber o resultado de `analisar_imagem`, apresente um resumo claro e didático da coloração pessoal obtida.
+        """
+    if ANALYSIS_MODE == "tool":
+        # A foto não é anexada à mensagem, apenas repassada à tool
+        etapa_imagem += """- A foto não é exibida para você: quando o usuário disser que enviou uma foto, considere a imagem recebida.
+        """
 
 with project_client:
     agent = project_client.agents.create_agent(
         model=os.environ["MODEL_DEPLOYMENT_NAME"], 
         name="StylistAgent", 
-        instructions= """
+        instructions= f"""
         Você é um agente especialista em coloração pessoal e análise de biotipo corporal.
 
         Você dispõe das seguintes ferramentas:
-        - analisar_imagem_arquivo(arquivo_imagem): analisa a imagem enviada e retorna informações sobre a coloração pessoal.
-        - classificar_biotipo(medida_ombro_cm, medida_cintura_cm, medida_quadril_cm): calcula e retorna o biotipo corporal com base nas medidas.
+        {ferramentas}
 
         Siga estas regras de forma estrita:
 
@@ -35,12 +49,7 @@ with project_client:
             responda apenas:
             "Por favor, envie uma foto do seu rosto, com boa iluminação e sem filtros, para que eu possa analisar sua coloração pessoal."
         - Até receber uma imagem, não avance para outras etapas e não forneça recomendações completas.
-
-        2. Ao receber uma imagem:
-        - Sempre que o usuário enviar uma imagem, você DEVE chamar a função `analisar_imagem_arquivo` com o arquivo recebido.
-        - A análise de coloração pessoal deve ser feita exclusivamente pela função.
-        - Após receber o resultado de `analisar_imagem_arquivo`, apresente um resumo claro e didático da coloração pessoal obtida.
-
+{etapa_imagem}
         3. Coleta das medidas corporais:
         - Após concluir a explicação inicial da coloração pessoal, peça as medidas aproximadas de:
             - ombro (cm),